@@ -1,8 +1,11 @@
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify, flash
+from flask import Flask, Response, render_template, request, session, redirect, url_for, flash, g
 import os
 import logging
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from functools import wraps
+from string import Template
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +15,39 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
+# Server-side sessions in Redis keep tokens out of the cookie. Without REDIS_URL the app uses
+# signed cookies; with it, Redis is required - every worker must agree on where sessions live.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    try:
+        import redis
+        from flask_session import Session
+        # Short timeouts so a stalled Redis cannot hold a worker on every request
+        session_redis = redis.Redis(connection_pool=redis.ConnectionPool.from_url(
+            REDIS_URL, max_connections=50, socket_connect_timeout=2, socket_timeout=2
+        ))
+        session_redis.ping()
+        app.config.update(SESSION_TYPE='redis', SESSION_REDIS=session_redis, SESSION_PERMANENT=False)
+        Session(app)
+        logger.info("Redis session store initialized")
+    except Exception as e:
+        logger.critical("Failed to initialize Redis session store: %s", e)
+        raise
+
+def ojsonify(obj, status=200):
+    """jsonify replacement serializing with orjson"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Configuration read once at startup
+BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:8080')
+BACKEND_VERIFY_USER_URL = f'{BACKEND_URL}/api/verify-user'
+APPID_REDIRECT_URI = os.getenv('APPID_REDIRECT_URI')
+
+# Shared HTTP session for backend calls (keep-alive pool)
+BACKEND_SESSION = requests.Session()
+BACKEND_SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
+BACKEND_SESSION.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
+
 # Initialize IBM App ID - with error handling
 try:
     from auth.app_id_auth import AppIDAuth
@@ -24,49 +60,21 @@ try:
     AUTH_ENABLED = True
     logger.info("IBM App ID authentication initialized")
 except Exception as e:
-    logger.error(f"Failed to initialize IBM App ID: {e}")
+    logger.error("Failed to initialize IBM App ID: %s", e)
     AUTH_ENABLED = False
 
-# Authentication decorator
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not AUTH_ENABLED:
-            return jsonify({"error": "Authentication not configured"}), 500
-        if 'access_token' not in session:
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-@app.route('/')
-def index():
-    """Main page"""
-    try:
-        user_info = session.get('user_info')
-        is_authenticated = 'access_token' in session and AUTH_ENABLED
-        
-        # Try to render template
-        return render_template('index.html', 
-                             user_info=user_info, 
-                             is_authenticated=is_authenticated,
-                             auth_enabled=AUTH_ENABLED)
-    except Exception as e:
-        logger.error(f"Template error in index route: {str(e)}")
-        # Fallback HTML if template fails
-        user_info = session.get('user_info', {})
-        is_authenticated = 'access_token' in session and AUTH_ENABLED
-        
-        return f"""
+# Fallback page used when the index template cannot be rendered, built once at import
+_FALLBACK_TEMPLATE = Template("""
         <!DOCTYPE html>
         <html>
             <head>
                 <title>Frontend App</title>
                 <style>
-                    body {{ font-family: Arial, sans-serif; margin: 40px; }}
-                    .status {{ background: #e8f5e8; padding: 10px; border-radius: 5px; margin: 10px 0; }}
-                    .error {{ background: #ffe8e8; padding: 10px; border-radius: 5px; margin: 10px 0; }}
-                    .btn {{ background: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 5px; }}
-                    a {{ color: #007bff; }}
+                    body { font-family: Arial, sans-serif; margin: 40px; }
+                    .status { background: #e8f5e8; padding: 10px; border-radius: 5px; margin: 10px 0; }
+                    .error { background: #ffe8e8; padding: 10px; border-radius: 5px; margin: 10px 0; }
+                    .btn { background: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 5px; }
+                    a { color: #007bff; }
                 </style>
             </head>
             <body>
@@ -74,38 +82,121 @@ def index():
                 
                 <div class="error">⚠️ Template Error: Using fallback HTML</div>
                 
-                {"<div class='status'>✅ Authentication: Enabled</div>" if AUTH_ENABLED else "<div class='error'>⚠️ Authentication: Not configured</div>"}
+                $auth_status
                 
-                {"<div class='status'>✅ Status: Logged in as " + str(user_info.get('email', user_info.get('name', 'User'))) + "</div>" if is_authenticated else "<div>ℹ️ Status: Not logged in</div>"}
+                $login_status
                 
                 <h2>Navigation:</h2>
                 <ul>
                     <li><a href="/health">Health Check</a></li>
                     <li><a href="/api/public">Public API</a></li>
                     <li><a href="/debug">Debug Info</a></li>
-                    {"<li><a href='/login' class='btn'>Login with IBM App ID</a></li>" if not is_authenticated and AUTH_ENABLED else ""}
-                    {"<li><a href='/profile' class='btn'>View Profile</a></li>" if is_authenticated else ""}
-                    {"<li><a href='/logout' class='btn'>Logout</a></li>" if is_authenticated else ""}
+                    $login_link
+                    $profile_link
+                    $logout_link
                 </ul>
                 
                 <h2>Error Details:</h2>
-                <p>Template loading failed: {str(e)}</p>
+                <p>Template loading failed: $error</p>
                 <p>This is a fallback page. Check if templates directory exists.</p>
             </body>
         </html>
-        """, 200
+        """)
+
+# Check once at startup whether the index template loads, instead of on every request
+try:
+    app.jinja_env.get_template('index.html')
+    TEMPLATES_OK = True
+    TEMPLATE_ERROR = ''
+except Exception as e:
+    logger.error("Index template unavailable, using fallback HTML: %s", e)
+    TEMPLATES_OK = False
+    TEMPLATE_ERROR = str(e)
+
+@app.before_request
+def load_session_state():
+    """Read login state from the session once per request"""
+    g.is_authenticated = AUTH_ENABLED and 'access_token' in session
+    g.user_info = session.get('user_info')
+
+def get_redirect_uri():
+    """OAuth redirect URI - APPID_REDIRECT_URI, or built from the current request"""
+    # Not cached when derived from the request, so one bad Host header cannot pin it for everyone
+    return APPID_REDIRECT_URI or url_for('auth_callback', _external=True)
+
+# Max-age (seconds) for endpoints whose responses browsers/CDNs may cache
+CACHEABLE_ENDPOINTS = {'public_api': 300}
+
+@app.after_request
+def add_cache_headers(response):
+    """Mark cacheable responses and answer revalidation with 304 Not Modified"""
+    max_age = CACHEABLE_ENDPOINTS.get(request.endpoint)
+    if max_age and response.status_code == 200:
+        # Logged-in responses carry per-user state, so keep them out of shared caches
+        if g.is_authenticated:
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.vary.add('Cookie')
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+# Authentication decorator
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not AUTH_ENABLED:
+            return ojsonify({"error": "Authentication not configured"}, 500)
+        if not g.is_authenticated:
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.route('/')
+def index():
+    """Main page"""
+    user_info = g.user_info
+    is_authenticated = g.is_authenticated
+    
+    template_error = TEMPLATE_ERROR
+    if TEMPLATES_OK:
+        try:
+            return render_template('index.html', 
+                                 user_info=user_info, 
+                                 is_authenticated=is_authenticated,
+                                 auth_enabled=AUTH_ENABLED)
+        except Exception as e:
+            logger.error("Template error in index route: %s", e)
+            template_error = str(e)
+    
+    # Fallback HTML if the template failed to load at startup or to render
+    user_info = user_info or {}
+    return _FALLBACK_TEMPLATE.substitute(
+        auth_status=("<div class='status'>✅ Authentication: Enabled</div>" if AUTH_ENABLED
+                     else "<div class='error'>⚠️ Authentication: Not configured</div>"),
+        login_status=("<div class='status'>✅ Status: Logged in as "
+                      + str(user_info.get('email', user_info.get('name', 'User'))) + "</div>"
+                      if is_authenticated else "<div>ℹ️ Status: Not logged in</div>"),
+        login_link=("<li><a href='/login' class='btn'>Login with IBM App ID</a></li>"
+                    if not is_authenticated and AUTH_ENABLED else ""),
+        profile_link="<li><a href='/profile' class='btn'>View Profile</a></li>" if is_authenticated else "",
+        logout_link="<li><a href='/logout' class='btn'>Logout</a></li>" if is_authenticated else "",
+        error=template_error
+    ), 200
 
 @app.route('/login')
 def login():
     """Login page - redirect to IBM App ID"""
     if not AUTH_ENABLED:
-        return jsonify({"error": "Authentication not configured"}), 500
+        return ojsonify({"error": "Authentication not configured"}, 500)
         
-    if 'access_token' in session:
+    if g.is_authenticated:
         return redirect(url_for('profile'))
     
     try:
-        redirect_uri = os.getenv("APPID_REDIRECT_URI") or url_for('auth_callback', _external=True)
+        redirect_uri = get_redirect_uri()
         login_url = app_id_auth.get_login_url(redirect_uri=redirect_uri)
         
         # Try to render template, fallback to simple HTML
@@ -123,8 +214,8 @@ def login():
             </html>
             """
     except Exception as e:
-        logger.error(f"Error generating login URL: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error generating login URL: %s", e)
+        return ojsonify({"error": str(e)}, 500)
 
 # In frontend app.py, modify the auth_callback route:
 @app.route('/auth/callback')
@@ -137,7 +228,7 @@ def auth_callback():
     
     try:
         # Frontend does its own token exchange (this already works)
-        redirect_uri = os.getenv("APPID_REDIRECT_URI") or url_for('auth_callback', _external=True)
+        redirect_uri = get_redirect_uri()
         tokens = app_id_auth.exchange_code_for_tokens(code, redirect_uri=redirect_uri)
         user_info = app_id_auth.get_user_info(tokens['access_token'])
         
@@ -150,7 +241,7 @@ def auth_callback():
         return redirect(url_for('profile'))
         
     except Exception as e:
-        logger.error(f"Authentication failed: {e}")
+        logger.error("Authentication failed: %s", e)
         flash(f"Authentication failed: {e}", 'error')
         return redirect(url_for('login'))
     
@@ -162,7 +253,7 @@ def logout():
     """Logout user"""
     user_email = session.get('user_info', {}).get('email', 'Unknown')
     session.clear()
-    logger.info(f"User logged out: {user_email}")
+    logger.debug("User logged out: %s", user_email)
     return redirect(url_for('index'))
 
 @app.route('/profile')
@@ -170,11 +261,11 @@ def logout():
 def profile():
     """User profile page"""
     try:
-        user_info = session.get('user_info')
+        user_info = g.user_info
         return render_template('profile.html', user_info=user_info)
     except Exception as e:
-        logger.error(f"Error in profile route: {e}")
-        user_info = session.get('user_info', {})
+        logger.error("Error in profile route: %s", e)
+        user_info = g.user_info or {}
         return f"""
         <html>
             <head><title>Profile</title></head>
@@ -194,36 +285,32 @@ def profile():
 @login_required
 def protected_api():
     """Protected API endpoint using user ID verification"""
-    user_info = session.get('user_info')
+    user_info = g.user_info
     user_id = user_info.get('sub')  # IBM App ID user ID
     
     # Send user ID to backend instead of token
-    backend_url = os.getenv('BACKEND_URL', 'http://localhost:8080')
-    
     try:
-        response = requests.post(f'{backend_url}/api/verify-user', 
-                               json={'user_id': user_id}, 
-                               timeout=10)
+        response = BACKEND_SESSION.post(BACKEND_VERIFY_USER_URL, 
+                                      json={'user_id': user_id}, 
+                                      timeout=10)
         
         if response.status_code == 200:
-            backend_data = response.json()
+            backend_data = orjson.loads(response.content)
         else:
             backend_data = {"error": f"Backend responded with {response.status_code}"}
     except Exception as e:
         backend_data = {"error": str(e)}
     
-    return jsonify({
+    return ojsonify({
         "message": "Frontend protected endpoint",
         "user": user_info,
         "backend_data": backend_data
     })
 
-@app.route('/api/public')
-def public_api():
-    """Public API endpoint"""
-    return jsonify({
+def _public_api_body(authenticated):
+    return orjson.dumps({
         "message": "This is a public endpoint",
-        "authenticated": 'access_token' in session and AUTH_ENABLED,
+        "authenticated": authenticated,
         "auth_enabled": AUTH_ENABLED,
         "data": [
             {"id": 1, "title": "Public Item 1"},
@@ -231,64 +318,83 @@ def public_api():
         ]
     })
 
+# Public API payloads only vary by login state, so serialize both once
+_PUBLIC_API_BODY_AUTH_ON = _public_api_body(True)
+_PUBLIC_API_BODY_AUTH_OFF = _public_api_body(False)
+
+@app.route('/api/public')
+def public_api():
+    """Public API endpoint"""
+    body = _PUBLIC_API_BODY_AUTH_ON if g.is_authenticated else _PUBLIC_API_BODY_AUTH_OFF
+    return Response(body, mimetype='application/json')
+
+# Health and test payloads are constant for the life of the process
+_HEALTH_BODY = orjson.dumps({
+    'status': 'healthy',
+    'message': 'Frontend application is running',
+    'auth_provider': 'IBM App ID' if AUTH_ENABLED else 'Disabled',
+    'auth_enabled': AUTH_ENABLED
+})
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'message': 'Frontend application is running',
-        'auth_provider': 'IBM App ID' if AUTH_ENABLED else 'Disabled',
-        'auth_enabled': AUTH_ENABLED
-    })
+    return Response(_HEALTH_BODY, mimetype='application/json')
+
+_TEST_BODY = orjson.dumps({
+    "message": "Test route working",
+    "auth_enabled": AUTH_ENABLED,
+    "templates_working": TEMPLATES_OK
+})
 
 @app.route('/test')
 def test_route():
     """Simple test route"""
-    return jsonify({
-        "message": "Test route working",
-        "auth_enabled": AUTH_ENABLED,
-        "templates_working": False  # We know templates aren't working
-    })
+    return Response(_TEST_BODY, mimetype='application/json')
+
+# Environment never changes after startup, so the debug view of it is built once
+_DEBUG_ENVIRONMENT_VARS = {
+    'APPID_REGION': os.getenv('APPID_REGION', 'Not set'),
+    'APPID_TENANT_ID': 'Set' if os.getenv('APPID_TENANT_ID') else 'Not set',
+    'APPID_CLIENT_ID': 'Set' if os.getenv('APPID_CLIENT_ID') else 'Not set',
+    'APPID_SECRET': 'Set' if os.getenv('APPID_SECRET') else 'Not set',
+    'BACKEND_URL': os.getenv('BACKEND_URL', 'Not set')
+}
 
 @app.route('/debug')
 def debug_info():
     """Debug information"""
-    return jsonify({
+    return ojsonify({
         'auth_enabled': AUTH_ENABLED,
-        'environment_vars': {
-            'APPID_REGION': os.getenv('APPID_REGION', 'Not set'),
-            'APPID_TENANT_ID': 'Set' if os.getenv('APPID_TENANT_ID') else 'Not set',
-            'APPID_CLIENT_ID': 'Set' if os.getenv('APPID_CLIENT_ID') else 'Not set',
-            'APPID_SECRET': 'Set' if os.getenv('APPID_SECRET') else 'Not set',
-            'BACKEND_URL': os.getenv('BACKEND_URL', 'Not set')
-        },
+        'environment_vars': _DEBUG_ENVIRONMENT_VARS,
         'session_data': {
             'authenticated': 'access_token' in session,
             'user_email': session.get('user_info', {}).get('email', 'Not logged in')
         }
     })
 
+# Error payloads are constant, so serialize them once
+_NOT_FOUND_BODY = orjson.dumps({"error": "Page not found"})
+_INTERNAL_ERROR_BODY = orjson.dumps({
+    "error": "Internal server error", 
+    "message": "Something went wrong",
+    "status": 500
+})
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
-    return jsonify({"error": "Page not found"}), 404
+    return Response(_NOT_FOUND_BODY, status=404, mimetype='application/json')
 
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
-    try:
-        logger.error(f"Internal error: {str(error)}")
-        return jsonify({
-            "error": "Internal server error", 
-            "message": "Something went wrong",
-            "status": 500
-        }), 500
-    except Exception as e:
-        # Last resort error handling
-        return f"<html><body><h1>500 Internal Server Error</h1><p>Error: {str(e)}</p></body></html>", 500
+    logger.error("Internal error: %s", error)
+    return Response(_INTERNAL_ERROR_BODY, status=500, mimetype='application/json')
 
+# Local development only - in production the app is served by Gunicorn (see Dockerfile)
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    logger.info(f"Starting Flask app on port {port}")
-    logger.info(f"Authentication enabled: {AUTH_ENABLED}")
+    logger.info("Starting Flask app on port %s", port)
+    logger.info("Authentication enabled: %s", AUTH_ENABLED)
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -1,14 +1,38 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 import jwt
+import orjson
 import os
 import logging
+import time
 from typing import Dict, Optional
-from urllib.parse import urlencode
+from urllib.parse import urlencode, quote_plus
 import json
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) timeout for IBM App ID calls so a slow upstream cannot pin a worker indefinitely
+REQUEST_TIMEOUT = (3.05, 10)
+
+# How long fetched public keys are trusted before re-fetching (handles key rotation)
+PUBLIC_KEYS_TTL = 3600
+# Minimum gap between forced re-fetches, so unknown key IDs cannot hammer App ID
+PUBLIC_KEYS_MIN_REFRESH = 60
+
+# Only algorithm App ID signs tokens with; anything else is rejected
+JWT_ALGORITHMS = ("RS256",)
+JWT_DECODE_OPTIONS = {"verify_aud": True, "require": ["exp", "iss", "aud"]}
+
 class AppIDAuth:
+    __slots__ = (
+        "region", "tenant_id", "client_id", "secret",
+        "base_url", "oauth_server_url", "management_url",
+        "_authorization_url", "_token_url", "_userinfo_url", "_keys_url",
+        "_base_login_qs", "_default_redirect_uri",
+        "_keys_by_kid", "_keys_fetched_at", "_session"
+    )
+    
     def __init__(self, region: str, tenant_id: str, client_id: str, secret: str):
         self.region = region
         self.tenant_id = tenant_id
@@ -19,35 +43,48 @@ class AppIDAuth:
         self.base_url = f"https://{region}.appid.cloud.ibm.com"
         self.oauth_server_url = f"{self.base_url}/oauth/v4/{tenant_id}"
         self.management_url = f"{self.base_url}/management/v4/{tenant_id}"
-        
-        # Cache for public keys
-        self._public_keys = None
-        
-        logger.info(f"Initialized IBM App ID auth for tenant: {tenant_id}")
+        self._authorization_url = f"{self.oauth_server_url}/authorization"
+        self._token_url = f"{self.oauth_server_url}/token"
+        self._userinfo_url = f"{self.oauth_server_url}/userinfo"
+        self._keys_url = f"{self.oauth_server_url}/publickeys"
+        self._base_login_qs = urlencode({
+            "client_id": client_id,
+            "response_type": "code",
+            "scope": "openid profile email"
+        })
+        self._default_redirect_uri = os.getenv("APPID_REDIRECT_URI", "http://localhost:5000/auth/callback")
+        
+        # Cache for public keys, parsed once per fetch and indexed by key ID
+        self._keys_by_kid = {}
+        self._keys_fetched_at = None
+        
+        # Reuse connections to IBM App ID across calls (keep-alive pool)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=50,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), raise_on_status=False)
+        )
+        self._session.mount("https://", adapter)
+        
+        logger.info("Initialized IBM App ID auth for tenant: %s", tenant_id)
     
     def get_login_url(self, redirect_uri: str = None, state: str = None) -> str:
         """Generate IBM App ID login URL"""
         if not redirect_uri:
-            redirect_uri = os.getenv("APPID_REDIRECT_URI", "http://localhost:5000/auth/callback")
+            redirect_uri = self._default_redirect_uri
         
-        params = {
-            "client_id": self.client_id,
-            "response_type": "code",
-            "redirect_uri": redirect_uri,
-            "scope": "openid profile email"
-        }
+        login_url = f"{self._authorization_url}?{self._base_login_qs}&redirect_uri={quote_plus(redirect_uri)}"
         
         if state:
-            params["state"] = state
+            login_url += f"&state={quote_plus(state)}"
             
-        return f"{self.oauth_server_url}/authorization?{urlencode(params)}"
+        return login_url
     
     def exchange_code_for_tokens(self, code: str, redirect_uri: str = None) -> Dict:
         """Exchange authorization code for tokens"""
         if not redirect_uri:
-            redirect_uri = os.getenv("APPID_REDIRECT_URI", "http://localhost:5000/auth/callback")
-        
-        token_url = f"{self.oauth_server_url}/token"
+            redirect_uri = self._default_redirect_uri
         
         data = {
             "grant_type": "authorization_code",
@@ -62,47 +99,47 @@ class AppIDAuth:
             "Accept": "application/json"
         }
         
-        response = requests.post(token_url, data=data, headers=headers)
+        response = self._session.post(self._token_url, data=data, headers=headers, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            tokens = response.json()
-            logger.info("Successfully exchanged code for tokens")
+            tokens = orjson.loads(response.content)
+            logger.debug("Successfully exchanged code for tokens")
             return tokens
         else:
-            logger.error(f"Token exchange failed: {response.status_code} - {response.text}")
+            logger.error("Token exchange failed: %s - %s", response.status_code, response.text[:200])
             raise Exception(f"Token exchange failed: {response.status_code}")
     
-    def get_public_keys(self) -> Dict:
-        """Get IBM App ID public keys for token verification"""
-        if self._public_keys:
-            return self._public_keys
+    def get_public_keys(self, force_refresh: bool = False) -> Dict:
+        """Get IBM App ID public keys for token verification, indexed by key ID"""
+        max_age = PUBLIC_KEYS_MIN_REFRESH if force_refresh else PUBLIC_KEYS_TTL
+        if self._keys_fetched_at is not None and time.monotonic() - self._keys_fetched_at < max_age:
+            return self._keys_by_kid
             
-        keys_url = f"{self.oauth_server_url}/publickeys"
-        
-        response = requests.get(keys_url)
+        response = self._session.get(self._keys_url, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            self._public_keys = response.json()
-            return self._public_keys
+            keys = orjson.loads(response.content).get("keys", [])
+            self._keys_by_kid = {
+                key["kid"]: jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
+                for key in keys
+                if key.get("kid")
+            }
+            self._keys_fetched_at = time.monotonic()
+            return self._keys_by_kid
         else:
             raise Exception(f"Failed to get public keys: {response.status_code}")
     
     def verify_token(self, token: str) -> Dict:
         """Verify and decode IBM App ID token"""
         try:
-            # Get public keys
-            public_keys = self.get_public_keys()
-            
             # Decode token header to get key ID
             unverified_header = jwt.get_unverified_header(token)
             key_id = unverified_header.get("kid")
             
-            # Find the right public key
-            public_key = None
-            for key in public_keys.get("keys", []):
-                if key.get("kid") == key_id:
-                    public_key = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
-                    break
+            # Find the right public key, re-fetching once in case keys were rotated
+            public_key = self.get_public_keys().get(key_id)
+            if not public_key:
+                public_key = self.get_public_keys(force_refresh=True).get(key_id)
             
             if not public_key:
                 raise Exception("Public key not found")
@@ -111,47 +148,44 @@ class AppIDAuth:
             payload = jwt.decode(
                 token,
                 public_key,
-                algorithms=["RS256"],
+                algorithms=JWT_ALGORITHMS,
                 audience=self.client_id,
-                issuer=self.oauth_server_url
+                issuer=self.oauth_server_url,
+                options=JWT_DECODE_OPTIONS
             )
             
-            logger.info(f"Token verified for user: {payload.get('sub')}")
+            logger.debug("Token verified for user: %s", payload.get('sub'))
             return payload
             
         except jwt.ExpiredSignatureError:
             logger.error("Token has expired")
             raise Exception("Token has expired")
         except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token: {e}")
+            logger.error("Invalid token: %s", e)
             raise Exception("Invalid token")
         except Exception as e:
-            logger.error(f"Token verification failed: {e}")
+            logger.error("Token verification failed: %s", e)
             raise Exception(f"Token verification failed: {e}")
     
     def get_user_info(self, access_token: str) -> Dict:
         """Get user information using access token"""
-        userinfo_url = f"{self.oauth_server_url}/userinfo"
-        
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Accept": "application/json"
         }
         
-        response = requests.get(userinfo_url, headers=headers)
+        response = self._session.get(self._userinfo_url, headers=headers, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            user_info = response.json()
-            logger.info(f"Retrieved user info for: {user_info.get('sub')}")
+            user_info = orjson.loads(response.content)
+            logger.debug("Retrieved user info for: %s", user_info.get('sub'))
             return user_info
         else:
-            logger.error(f"Failed to get user info: {response.status_code} - {response.text}")
+            logger.error("Failed to get user info: %s - %s", response.status_code, response.text[:200])
             raise Exception(f"Failed to get user info: {response.status_code}")
     
     def refresh_token(self, refresh_token: str) -> Dict:
         """Refresh access token using refresh token"""
-        token_url = f"{self.oauth_server_url}/token"
-        
         data = {
             "grant_type": "refresh_token",
             "refresh_token": refresh_token,
@@ -164,12 +198,12 @@ class AppIDAuth:
             "Accept": "application/json"
         }
         
-        response = requests.post(token_url, data=data, headers=headers)
+        response = self._session.post(self._token_url, data=data, headers=headers, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            tokens = response.json()
-            logger.info("Successfully refreshed tokens")
+            tokens = orjson.loads(response.content)
+            logger.debug("Successfully refreshed tokens")
             return tokens
         else:
-            logger.error(f"Token refresh failed: {response.status_code} - {response.text}")
+            logger.error("Token refresh failed: %s - %s", response.status_code, response.text[:200])
             raise Exception(f"Token refresh failed: {response.status_code}")
\ No newline at end of file